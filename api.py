@@ -1,19 +1,26 @@
 from __future__ import annotations
 
+import asyncio
 from datetime import datetime
+from enum import Enum
+from functools import lru_cache
 from pathlib import Path
-from time import perf_counter
+from time import perf_counter, time
+from typing import Annotated, Iterator
+from zoneinfo import ZoneInfo
 
-from fastapi import FastAPI, HTTPException
+from fastapi import Body, FastAPI, HTTPException, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
 from loguru import logger
+import msgspec
 import polars as pl
 from pydantic import BaseModel
-import pytz
 
 
 ROOT = Path(__file__).resolve().parent
-CHANNELS_PARQUET = ROOT / "channels.parquet"
+CHANNELS_DIR = ROOT / "channels"
 EPG_PARQUET = ROOT / "epg.parquet"
 
 
@@ -39,6 +46,52 @@ class ProgramResponse(BaseModel):
     description: str | None
 
 
+class BatchOperation(str, Enum):
+    categories = "categories"
+    channels = "channels"
+    programs = "programs"
+
+
+class BatchRequest(BaseModel):
+    op: BatchOperation
+    category: str | None = None
+    channel: str | None = None
+
+
+# Cached channel listings embed the programme airing "now", so they are only reused
+# within the same minute.
+CURRENT_PROGRAM_CACHE_SECONDS = 60
+STREAM_BATCH_ROWS = 2048
+BATCH_MAX_REQUESTS = 32
+
+_json_encoder = msgspec.json.Encoder()
+
+
+def _encode(df: pl.DataFrame) -> bytes:
+    # Polars serializes the rows to JSON in Rust; nothing is materialized per row in Python.
+    return df.write_json().encode()
+
+
+def _json_response(body: bytes) -> Response:
+    return Response(content=body, media_type="application/json")
+
+
+def _iter_json_array(df: pl.DataFrame) -> Iterator[bytes]:
+    """Encode ``df`` as one JSON array, emitted in ``STREAM_BATCH_ROWS``-row pieces."""
+    yield b"["
+    first = True
+    for batch in df.iter_slices(n_rows=STREAM_BATCH_ROWS):
+        # Each slice encodes as its own array; strip the brackets and splice with commas.
+        rows = batch.write_json()[1:-1]
+        if not rows:
+            continue
+        if not first:
+            yield b","
+        yield rows.encode()
+        first = False
+    yield b"]"
+
+
 app = FastAPI(title="IPTV Parser API", version="0.1.0")
 
 app.add_middleware(
@@ -52,8 +105,8 @@ app.add_middleware(
 
 def _ensure_inputs_exist() -> None:
     missing: list[str] = []
-    if not CHANNELS_PARQUET.exists():
-        missing.append(str(CHANNELS_PARQUET.name))
+    if not CHANNELS_DIR.exists():
+        missing.append(str(CHANNELS_DIR.name))
     if not EPG_PARQUET.exists():
         missing.append(str(EPG_PARQUET.name))
 
@@ -64,41 +117,88 @@ def _ensure_inputs_exist() -> None:
         )
 
 
-@app.get("/categories", response_model=list[CategoryResponse])
-def get_categories() -> list[CategoryResponse]:
-    _ensure_inputs_exist()
-    started = perf_counter()
+FileVersion = tuple[int, int]
 
-    categories_df = (
-        pl.scan_parquet(CHANNELS_PARQUET)
-        .select(pl.col("category").alias("name"))
-        .drop_nulls()
-        .unique()
-        .sort("name")
-        .collect()
-    )
 
-    rows = categories_df.to_dicts()
-    result = [CategoryResponse(**row) for row in rows]
-    logger.info("GET /categories -> {} rows in {:.3f}s", len(result), perf_counter() - started)
-    return result
+def _file_version(path: Path) -> FileVersion:
+    """Identify the current version of an input with a single ``stat`` call.
 
+    parse-m3u publishes every channels dataset as a new directory behind the symlink,
+    so its inode changes on each rewrite; the mtime covers files rewritten in place.
+    """
+    stat = path.stat()
+    return stat.st_ino, stat.st_mtime_ns
+
+
+# Scans are built once per file version and reused across requests, so the parquet
+# footers and schema are only read again after the inputs are rewritten.
+@lru_cache(maxsize=1)
+def _scan_channels(version: FileVersion) -> pl.LazyFrame:
+    # parse-m3u swaps in new datasets by repointing the channels symlink; scan the
+    # version it points at now so a cached scan never mixes files from two versions.
+    return pl.scan_parquet(CHANNELS_DIR.resolve(), hive_partitioning=True)
 
-@app.get("/categories/{category}/channels", response_model=list[ChannelResponse])
-def get_channels_by_category(category: str) -> list[ChannelResponse]:
-    _ensure_inputs_exist()
-    started = perf_counter()
-    now_utc = datetime.now(pytz.UTC)
+
+@lru_cache(maxsize=1)
+def _scan_epg(version: FileVersion) -> pl.LazyFrame:
+    # Queries filter on channel and stop_dt, which are cheap to decode; "prefiltered"
+    # evaluates those first and decodes the remaining columns only for matching rows.
+    return pl.scan_parquet(EPG_PARQUET, parallel="prefiltered")
+
+
+def _epg_now(epg_lf: pl.LazyFrame) -> datetime:
+    # parse-xmltv stores timestamps already converted to the display time zone; polars
+    # only compares datetimes of the same zone, so express "now" in that zone too.
+    return datetime.now(ZoneInfo(epg_lf.collect_schema()["stop_dt"].time_zone))
+
+
+@lru_cache(maxsize=1)
+def _categories_body(channels_version: FileVersion) -> bytes:
+    channels_lf = _scan_channels(channels_version)
+    category_dtype = channels_lf.collect_schema()["category"]
+    if isinstance(category_dtype, pl.Enum):
+        # parse-m3u writes the sorted, distinct categories as the Enum's variants, so
+        # the answer comes from the schema without reading any rows.
+        categories_df = pl.DataFrame({"name": category_dtype.categories})
+    else:
+        categories_df = (
+            channels_lf.select(pl.col("category").alias("name"))
+            .drop_nulls()
+            .unique()
+            .sort("name")
+            .collect()
+        )
+    return _encode(categories_df)
+
+
+@lru_cache(maxsize=64)
+def _channels_body(
+    category: str,
+    channels_version: FileVersion,
+    epg_version: FileVersion,
+    time_bucket: int,
+) -> bytes:
+    channels_lf = _scan_channels(channels_version)
+
+    # Compare against a literal of the column's own dtype: for the Enum written by
+    # parse-m3u that is an integer compare, and the predicate stays pushed down to the
+    # partition pruning instead of forcing a cast of the column. A category outside the
+    # Enum cannot match anything (and cannot be cast), so answer it directly.
+    category_dtype = channels_lf.collect_schema()["category"]
+    if isinstance(category_dtype, pl.Enum) and category not in category_dtype.categories:
+        return b"[]"
+    category_literal = pl.lit(category, dtype=category_dtype)
+
+    epg_lf = _scan_epg(epg_version)
+    now = _epg_now(epg_lf)
 
     current_programs = (
-        pl.scan_parquet(EPG_PARQUET)
-        .filter(
-            pl.col("start_dt").le(pl.lit(now_utc)),
-            pl.col("stop_dt").gt(pl.lit(now_utc)),
+        epg_lf.filter(
+            pl.col("start_dt").le(pl.lit(now)),
+            pl.col("stop_dt").gt(pl.lit(now)),
         )
         .sort(["channel", "start_dt"], descending=[False, True])
         .unique(subset=["channel"], keep="first")
-        .with_columns(pl.col("stop_dt").dt.convert_time_zone("America/New_York"))
         .select(
             [
                 pl.col("channel").alias("guide_id"),
@@ -109,38 +209,25 @@ def get_channels_by_category(category: str) -> list[ChannelResponse]:
     )
 
     channels_df = (
-        pl.scan_parquet(CHANNELS_PARQUET)
-        .filter(pl.col("category") == category)
+        # Channels without a group-title sit in the null hive partition, which an Enum
+        # equality still lets through; exclude it explicitly.
+        channels_lf.filter(
+            pl.col("category").is_not_null(), pl.col("category") == category_literal
+        )
         .select(["name", "logo", "url", "category", "guide_id"])
         .join(current_programs, on="guide_id", how="left")
         .sort("name")
         .collect()
     )
-
-    rows = channels_df.to_dicts()
-    result = [ChannelResponse(**row) for row in rows]
-    logger.info(
-        "GET /categories/{}/channels -> {} rows in {:.3f}s",
-        category,
-        len(result),
-        perf_counter() - started,
-    )
-    return result
+    return _encode(channels_df)
 
 
-@app.get("/channels/{channel}/programs", response_model=list[ProgramResponse])
-def get_programs_by_channel(channel: str) -> list[ProgramResponse]:
-    _ensure_inputs_exist()
-    started = perf_counter()
-
-    programs_df = (
-        pl.scan_parquet(EPG_PARQUET)
-        .filter(
+def _programs_df(channel: str, epg_version: FileVersion) -> pl.DataFrame:
+    epg_lf = _scan_epg(epg_version)
+    return (
+        epg_lf.filter(
             pl.col("channel").eq(channel),
-            pl.col("stop_dt").gt(pl.lit(datetime.now(pytz.UTC))),
-        )
-        .with_columns(
-            pl.col("start_dt", "stop_dt").dt.convert_time_zone("America/New_York")
+            pl.col("stop_dt").gt(pl.lit(_epg_now(epg_lf))),
         )
         .select(
             [
@@ -151,17 +238,112 @@ def get_programs_by_channel(channel: str) -> list[ProgramResponse]:
                 "description",
             ]
         )
-        .unique(["channel", "start_dt", "title"])
         .sort("start_dt")
-        .collect()
+        .collect(engine="streaming")
+    )
+
+
+def _current_program_bucket() -> int:
+    return int(time() // CURRENT_PROGRAM_CACHE_SECONDS)
+
+
+@app.get("/categories", responses={200: {"model": list[CategoryResponse]}})
+def get_categories() -> Response:
+    _ensure_inputs_exist()
+    started = perf_counter()
+
+    body = _categories_body(_file_version(CHANNELS_DIR))
+
+    logger.info(
+        "GET /categories -> {} bytes in {:.3f}s",
+        len(body),
+        perf_counter() - started,
+    )
+    return _json_response(body)
+
+
+@app.get(
+    "/categories/{category}/channels", responses={200: {"model": list[ChannelResponse]}}
+)
+def get_channels_by_category(category: str) -> Response:
+    _ensure_inputs_exist()
+    started = perf_counter()
+
+    body = _channels_body(
+        category,
+        _file_version(CHANNELS_DIR),
+        _file_version(EPG_PARQUET),
+        _current_program_bucket(),
     )
 
-    rows = programs_df.to_dicts()
-    result = [ProgramResponse(**row) for row in rows]
+    logger.info(
+        "GET /categories/{}/channels -> {} bytes in {:.3f}s",
+        category,
+        len(body),
+        perf_counter() - started,
+    )
+    return _json_response(body)
+
+
+@app.get("/channels/{channel}/programs", responses={200: {"model": list[ProgramResponse]}})
+def get_programs_by_channel(channel: str) -> StreamingResponse:
+    _ensure_inputs_exist()
+    started = perf_counter()
+
+    programs_df = _programs_df(channel, _file_version(EPG_PARQUET))
+
     logger.info(
         "GET /channels/{}/programs -> {} rows in {:.3f}s",
         channel,
-        len(result),
+        programs_df.height,
+        perf_counter() - started,
+    )
+    return StreamingResponse(_iter_json_array(programs_df), media_type="application/json")
+
+
+def _input_versions() -> tuple[FileVersion, FileVersion]:
+    _ensure_inputs_exist()
+    return _file_version(CHANNELS_DIR), _file_version(EPG_PARQUET)
+
+
+@app.post("/batch")
+async def batch(
+    requests: Annotated[list[BatchRequest], Body(max_length=BATCH_MAX_REQUESTS)],
+) -> Response:
+    """Run several lookups in one round trip.
+
+    Each entry names an operation (``categories``, ``channels`` with a ``category``,
+    or ``programs`` with a ``channel``). The response is a JSON array holding each
+    operation's result in request order. At most ``BATCH_MAX_REQUESTS`` entries are
+    accepted per call.
+    """
+    started = perf_counter()
+
+    for request in requests:
+        if request.op == BatchOperation.channels and request.category is None:
+            raise HTTPException(status_code=422, detail="'channels' requires a category.")
+        if request.op == BatchOperation.programs and request.channel is None:
+            raise HTTPException(status_code=422, detail="'programs' requires a channel.")
+
+    # Resolve file versions once so every sub-request sees the same inputs. This
+    # touches the filesystem, so keep it off the event loop like the lookups.
+    channels_version, epg_version = await run_in_threadpool(_input_versions)
+    bucket = _current_program_bucket()
+
+    def run(request: BatchRequest) -> bytes:
+        if request.op == BatchOperation.categories:
+            return _categories_body(channels_version)
+        if request.op == BatchOperation.channels:
+            return _channels_body(request.category, channels_version, epg_version, bucket)
+        return _encode(_programs_df(request.channel, epg_version))
+
+    bodies = await asyncio.gather(*(run_in_threadpool(run, request) for request in requests))
+    body = _json_encoder.encode([msgspec.Raw(part) for part in bodies])
+
+    logger.info(
+        "POST /batch ({} requests) -> {} bytes in {:.3f}s",
+        len(requests),
+        len(body),
         perf_counter() - started,
     )
-    return result
+    return _json_response(body)
@@ -1,10 +1,13 @@
 from enum import Enum
 import csv
-from dataclasses import asdict
-from datetime import datetime
 import json
+import operator
+import os
 from pathlib import Path
-from time import perf_counter
+import queue
+import shutil
+import threading
+from time import perf_counter, time_ns
 from typing import Optional
 
 import typer
@@ -12,8 +15,9 @@ from loguru import logger
 from m3u_parser import M3uParser
 from rich import print
 import polars as pl
+import pyarrow.parquet as pq
 
-from xmltv_parser import XMLTVParser
+from xmltv_parser import PROGRAM_SCHEMA, XMLTVParser, XMLTVProgram
 
 app = typer.Typer()
 
@@ -46,9 +50,29 @@ PROGRAM_FIELDS = [
     "last_chance",
 ]
 
+_program_values = operator.attrgetter(*PROGRAM_FIELDS)
+_START_DT_INDEX = PROGRAM_FIELDS.index("start_dt")
+_STOP_DT_INDEX = PROGRAM_FIELDS.index("stop_dt")
+
+CSV_BATCH_ROWS = 1000
+CSV_QUEUE_BATCHES = 8
+
+# Final parquet outputs are written once and scanned on every API request, so trade
+# some write time for smaller files. String columns are dictionary-encoded by the
+# polars writer already.
+PARQUET_COMPRESSION = "zstd"
+PARQUET_COMPRESSION_LEVEL = 7
+PARQUET_ROW_GROUP_SIZE = 64_000
+
+# Programme times are stored already converted to the zone the API serves them in.
+EPG_TIMEZONE = "America/New_York"
+
 
 def write_df_as(
-    df: pl.DataFrame, output_format: OutputFormat, output_file: Optional[Path] = None
+    df: pl.DataFrame,
+    output_format: OutputFormat,
+    output_file: Optional[Path] = None,
+    partition_by: Optional[list[str]] = None,
 ):
     if output_file is None:
         output_file = Path(f"output.{output_format.value}")
@@ -58,11 +82,86 @@ def write_df_as(
     elif output_format == OutputFormat.csv:
         df.write_csv(str(output_file))
     elif output_format == OutputFormat.parquet:
-        df.write_parquet(str(output_file))
+        # Frames built from Python lists can be fragmented; make them contiguous so
+        # row groups come out full-sized.
+        df = df.rechunk()
+        if partition_by:
+            _write_partitioned_parquet(df, output_file, partition_by)
+        else:
+            df.write_parquet(
+                str(output_file),
+                compression=PARQUET_COMPRESSION,
+                compression_level=PARQUET_COMPRESSION_LEVEL,
+                statistics=True,
+                row_group_size=PARQUET_ROW_GROUP_SIZE,
+            )
     else:
         raise ValueError(f"Unsupported output format: {output_format}")
 
 
+def _is_partitioned_dataset(path: Path, partition_by: list[str]) -> bool:
+    prefix = f"{partition_by[0]}="
+    return path.is_dir() and all(
+        child.is_dir() and child.name.startswith(prefix) for child in path.iterdir()
+    )
+
+
+def _dataset_versions(output_dir: Path) -> list[Path]:
+    prefix = f".{output_dir.name}."
+    return [
+        path
+        for path in output_dir.parent.iterdir()
+        if path.name.startswith(prefix) and path.name[len(prefix) :].isdigit()
+    ]
+
+
+def _write_partitioned_parquet(df: pl.DataFrame, output_dir: Path, partition_by: list[str]):
+    # The dataset is written to a fresh versioned sibling directory and ``output_dir``
+    # is a symlink to it. Swapping the symlink is a single rename, so readers always
+    # find either the previous dataset or the new one.
+    output_dir = Path(os.path.abspath(output_dir))
+    previous = output_dir.resolve() if output_dir.exists() else None
+    # Only ever replace a previous dataset, never an arbitrary file or directory.
+    if previous is not None and not _is_partitioned_dataset(previous, partition_by):
+        raise ValueError(
+            f"Refusing to overwrite {output_dir}: it is not a parquet dataset "
+            f"partitioned by {partition_by[0]!r}."
+        )
+    staging_link = output_dir.with_name(f".{output_dir.name}.link")
+    if staging_link.is_symlink():
+        staging_link.unlink()
+    elif staging_link.exists():
+        raise ValueError(f"Refusing to overwrite {staging_link}: it is not a symlink.")
+
+    version_dir = output_dir.with_name(f".{output_dir.name}.{time_ns()}")
+    version_dir.mkdir()
+    df.write_parquet(
+        str(version_dir),
+        compression=PARQUET_COMPRESSION,
+        compression_level=PARQUET_COMPRESSION_LEVEL,
+        statistics=True,
+        row_group_size=PARQUET_ROW_GROUP_SIZE,
+        partition_by=partition_by,
+    )
+
+    staging_link.symlink_to(version_dir.name, target_is_directory=True)
+    if previous is not None and not output_dir.is_symlink():
+        # Datasets written before the symlink layout are plain directories, and a
+        # symlink cannot be renamed over a directory. Move it aside first; this one
+        # upgrade is the only time readers can briefly find no dataset.
+        previous = output_dir.with_name(f".{output_dir.name}.{time_ns()}")
+        os.replace(output_dir, previous)
+        previous = previous.resolve()
+    os.replace(staging_link, output_dir)
+
+    # Keep the dataset just replaced for scans that are still reading it; older
+    # versions are removed, and only if they still look like datasets.
+    keep = {version_dir.resolve(), previous}
+    for stale_dir in _dataset_versions(output_dir):
+        if stale_dir.resolve() not in keep and _is_partitioned_dataset(stale_dir, partition_by):
+            shutil.rmtree(stale_dir)
+
+
 def apply_filter_to_category(
     df: pl.DataFrame, category: str, filter: pl.Expr
 ) -> pl.DataFrame:
@@ -77,24 +176,68 @@ def replace_in_name(df: pl.DataFrame, old: str, new: str) -> pl.DataFrame:
     return df.with_columns(pl.col("name").str.replace(old, new))
 
 
-def _serialize_program_row(row: dict) -> dict:
-    serialized: dict = {}
-    for key, value in row.items():
-        if isinstance(value, datetime):
-            serialized[key] = value.isoformat()
-        else:
-            serialized[key] = value
-    return serialized
+def _program_row(program: XMLTVProgram) -> list:
+    # Fetch every field in one attrgetter call; only the two datetimes need formatting.
+    row = list(_program_values(program))
+    start_dt = row[_START_DT_INDEX]
+    if start_dt is not None:
+        row[_START_DT_INDEX] = start_dt.isoformat()
+    stop_dt = row[_STOP_DT_INDEX]
+    if stop_dt is not None:
+        row[_STOP_DT_INDEX] = stop_dt.isoformat()
+    return row
 
 
 def _write_programs_csv(parser: XMLTVParser, source_file: Path, destination_file: Path) -> int:
+    # Parsing and row building stay on this thread; a writer thread only CSV-encodes
+    # and writes the batches, so XML decoding overlaps with encoding and file I/O.
+    batches: queue.Queue[list[list] | None] = queue.Queue(maxsize=CSV_QUEUE_BATCHES)
+    errors: list[BaseException] = []
+
+    def write_batches() -> None:
+        try:
+            with destination_file.open("w", encoding="utf-8", newline="") as handle:
+                writer = csv.writer(handle)
+                writer.writerow(PROGRAM_FIELDS)
+                while (batch := batches.get()) is not None:
+                    writer.writerows(batch)
+        except BaseException as exc:
+            errors.append(exc)
+            # Keep draining so the parser never blocks on a full queue.
+            while batches.get() is not None:
+                pass
+
+    writer_thread = threading.Thread(target=write_batches, name="programs-csv-writer")
+    writer_thread.start()
+
     count = 0
-    with destination_file.open("w", encoding="utf-8", newline="") as handle:
-        writer = csv.DictWriter(handle, fieldnames=PROGRAM_FIELDS)
-        writer.writeheader()
+    batch: list[list] = []
+    try:
         for program in parser.iter_parse(source_file):
-            writer.writerow(_serialize_program_row(asdict(program)))
+            batch.append(_program_row(program))
             count += 1
+            if len(batch) == CSV_BATCH_ROWS:
+                batches.put(batch)
+                batch = []
+        if batch:
+            batches.put(batch)
+    finally:
+        batches.put(None)
+        writer_thread.join()
+
+    if errors:
+        raise errors[0]
+    return count
+
+
+def _write_programs_parquet(
+    parser: XMLTVParser, source_file: Path, destination_file: Path
+) -> int:
+    count = 0
+    with pq.ParquetWriter(str(destination_file), PROGRAM_SCHEMA, compression="zstd") as writer:
+        for batch in parser.iter_record_batches(source_file):
+            writer.write_batch(batch)
+            count += batch.num_rows
     return count
 
 
@@ -106,7 +249,8 @@ def _write_programs_json(parser: XMLTVParser, source_file: Path, destination_fil
         for program in parser.iter_parse(source_file):
             if not first:
                 handle.write(",")
-            handle.write(json.dumps(_serialize_program_row(asdict(program)), ensure_ascii=False))
+            record = dict(zip(PROGRAM_FIELDS, _program_row(program)))
+            handle.write(json.dumps(record, ensure_ascii=False))
             first = False
             count += 1
         handle.write("]")
@@ -139,8 +283,12 @@ def parse_m3u(file: Path, output_format: OutputFormat, output_file: Path):
         pl.DataFrame(channels)
         .drop("tvg", "country", "language")
     )
+    # Store category as an Enum of the categories present, so readers can list them
+    # from the schema and compare categories as integers.
+    categories = df.get_column("category").drop_nulls().unique().sort()
+    df = df.with_columns(pl.col("category").cast(pl.Enum(categories)))
 
-    write_df_as(df, output_format, output_file)
+    write_df_as(df, output_format, output_file, partition_by=["category"])
     elapsed = perf_counter() - started
     logger.info("parse-m3u completed in {:.3f}s", elapsed)
     print(f"Wrote {len(df)} channels to {output_file}.")
@@ -163,13 +311,31 @@ def parse_xmltv(file: Path, output_format: OutputFormat, output_file: Path):
     elif output_format == OutputFormat.json:
         program_count = _write_programs_json(parser, file, output_file)
     elif output_format == OutputFormat.parquet:
-        temp_csv = output_file.with_suffix(f"{output_file.suffix}.tmp.csv")
+        temp_parquet = output_file.with_suffix(f"{output_file.suffix}.tmp.parquet")
         try:
-            program_count = _write_programs_csv(parser, file, temp_csv)
-            pl.scan_csv(str(temp_csv), try_parse_dates=True).sink_parquet(str(output_file), engine="streaming")
+            program_count = _write_programs_parquet(parser, file, temp_parquet)
+            # Feeds often repeat a programme; drop the duplicates once here rather than
+            # in every API request. Clustering by channel and stop time keeps row-group
+            # min/max statistics tight, so channel/time range filters can skip most
+            # row groups.
+            (
+                pl.scan_parquet(str(temp_parquet))
+                .unique(["channel", "start_dt", "title"], keep="first")
+                .sort(["channel", "stop_dt"])
+                .with_columns(pl.col("start_dt", "stop_dt").dt.convert_time_zone(EPG_TIMEZONE))
+                .sink_parquet(
+                    str(output_file),
+                    compression=PARQUET_COMPRESSION,
+                    compression_level=PARQUET_COMPRESSION_LEVEL,
+                    row_group_size=PARQUET_ROW_GROUP_SIZE,
+                    statistics=True,
+                    engine="streaming",
+                )
+            )
+            program_count = pl.scan_parquet(str(output_file)).select(pl.len()).collect().item()
         finally:
-            if temp_csv.exists():
-                temp_csv.unlink()
+            if temp_parquet.exists():
+                temp_parquet.unlink()
     else:
         raise ValueError(f"Unsupported output format: {output_format}")
 
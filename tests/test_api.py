@@ -0,0 +1,102 @@
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+import api
+import main
+
+
+PLAYLIST = """#EXTM3U
+#EXTINF:-1 tvg-id="movies1" tvg-logo="http://logo.example.com/1.png" group-title="Movies",Movie Channel
+http://stream.example.com/live/1
+#EXTINF:-1 tvg-id="news1" tvg-logo="http://logo.example.com/2.png" group-title="News",News Channel
+http://stream.example.com/live/2
+#EXTINF:-1 tvg-id="misc1" tvg-logo="http://logo.example.com/3.png",Uncategorized Channel
+http://stream.example.com/live/3
+"""
+
+GUIDE = """<?xml version="1.0" encoding="UTF-8"?>
+<tv>
+  <programme start="20240101000000 +0000" stop="20240101010000 +0000" channel="movies1">
+    <title>Feature</title>
+    <desc>A film.</desc>
+  </programme>
+  <programme start="20990101000000 +0000" stop="20990101010000 +0000" channel="movies1">
+    <title>Sequel</title>
+    <desc>Another film.</desc>
+  </programme>
+</tv>
+"""
+
+
+@pytest.fixture
+def client(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> TestClient:
+    playlist = tmp_path / "list.m3u"
+    playlist.write_text(PLAYLIST)
+    guide = tmp_path / "epg.xml"
+    guide.write_text(GUIDE)
+
+    channels_dir = tmp_path / "channels"
+    epg_parquet = tmp_path / "epg.parquet"
+    main.parse_m3u(playlist, main.OutputFormat.parquet, channels_dir)
+    main.parse_xmltv(guide, main.OutputFormat.parquet, epg_parquet)
+
+    monkeypatch.setattr(api, "CHANNELS_DIR", channels_dir)
+    monkeypatch.setattr(api, "EPG_PARQUET", epg_parquet)
+    for cached in (api._scan_channels, api._scan_epg, api._categories_body, api._channels_body):
+        cached.cache_clear()
+    return TestClient(api.app)
+
+
+def test_categories_skip_channels_without_category(client: TestClient):
+    response = client.get("/categories")
+
+    assert response.status_code == 200
+    assert response.json() == [{"name": "Movies"}, {"name": "News"}]
+
+
+def test_channels_without_category_are_not_listed_under_a_category(client: TestClient):
+    response = client.get("/categories/Movies/channels")
+
+    assert response.status_code == 200
+    assert [channel["name"] for channel in response.json()] == ["Movie Channel"]
+
+
+def test_batch_returns_results_in_request_order(client: TestClient):
+    response = client.post(
+        "/batch",
+        json=[
+            {"op": "programs", "channel": "movies1"},
+            {"op": "categories"},
+            {"op": "channels", "category": "News"},
+        ],
+    )
+
+    assert response.status_code == 200
+    programs, categories, channels = response.json()
+    assert [program["title"] for program in programs] == ["Sequel"]
+    assert categories == [{"name": "Movies"}, {"name": "News"}]
+    assert [channel["name"] for channel in channels] == ["News Channel"]
+
+
+@pytest.mark.parametrize(
+    "request_body", [{"op": "channels"}, {"op": "programs"}], ids=["channels", "programs"]
+)
+def test_batch_rejects_operation_without_its_argument(client: TestClient, request_body: dict):
+    response = client.post("/batch", json=[{"op": "categories"}, request_body])
+
+    assert response.status_code == 422
+
+
+def test_batch_unknown_category_is_empty(client: TestClient):
+    response = client.post("/batch", json=[{"op": "channels", "category": "Nope"}])
+
+    assert response.status_code == 200
+    assert response.json() == [[]]
+
+
+def test_batch_rejects_too_many_requests(client: TestClient):
+    response = client.post("/batch", json=[{"op": "categories"}] * (api.BATCH_MAX_REQUESTS + 1))
+
+    assert response.status_code == 422
@@ -1,20 +1,32 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
 from pathlib import Path
-import re
 from time import perf_counter
-from typing import Iterator
-import xml.etree.ElementTree as ET
+from typing import Any, Iterator
 
 from loguru import logger
+from lxml import etree
+import pyarrow as pa
 from tqdm import tqdm
 
 
-_XMLTV_DATETIME_RE = re.compile(
-    r"^(?P<stamp>\d{8}(?:\d{2}(?:\d{2}(?:\d{2})?)?)?)(?:\s+(?P<tz>[+-]\d{4}))?$"
-)
+_XMLTV_STAMP_LENGTHS = frozenset((8, 10, 12, 14))
+
+
+@lru_cache(maxsize=64)
+def _utc_offset(value: str) -> timezone | None:
+    """Parse a ``+HHMM``/``-HHMM`` offset; feeds share a handful, so they are cached."""
+    digits = value[1:]
+    if len(value) != 5 or value[0] not in "+-" or not (digits.isascii() and digits.isdigit()):
+        return None
+    hours, minutes = int(digits[:2]), int(digits[2:])
+    if hours >= 24 or minutes >= 60:
+        return None
+    offset = timedelta(hours=hours, minutes=minutes)
+    return timezone(-offset if value[0] == "-" else offset)
 
 
 @dataclass(slots=True)
@@ -40,6 +52,115 @@ class XMLTVProgram:
     last_chance: str | None
 
 
+_TIMESTAMP = pa.timestamp("us", tz="UTC")
+
+# Arrow layout of XMLTVProgram, in field order.
+PROGRAM_SCHEMA = pa.schema(
+    [
+        ("channel", pa.string()),
+        ("start", pa.string()),
+        ("start_dt", _TIMESTAMP),
+        ("stop", pa.string()),
+        ("stop_dt", _TIMESTAMP),
+        ("title", pa.string()),
+        ("sub_title", pa.string()),
+        ("description", pa.string()),
+        ("date", pa.string()),
+        ("category", pa.string()),
+        ("keyword", pa.string()),
+        ("language", pa.string()),
+        ("orig_language", pa.string()),
+        ("length", pa.string()),
+        ("country", pa.string()),
+        ("episode_num", pa.string()),
+        ("is_new", pa.bool_()),
+        ("premiere", pa.string()),
+        ("last_chance", pa.string()),
+    ]
+)
+
+
+# Listings sit on a shared time grid, so the same stamps recur across channels and a
+# programme's stop is usually the next one's start; datetimes are immutable, so
+# parsed values can be shared.
+@lru_cache(maxsize=4096)
+def parse_xmltv_datetime(value: str | None) -> datetime | None:
+    if not value:
+        return None
+
+    # Grammar: YYYYMMDD[HH[MM[SS]]] with an optional " +HHMM" offset. The fields
+    # are fixed-width, so slice them directly instead of going through strptime.
+    parts = value.split()
+    if len(parts) == 1:
+        tzinfo = None
+    elif len(parts) == 2:
+        tzinfo = _utc_offset(parts[1])
+        if tzinfo is None:
+            return None
+    else:
+        return None
+
+    stamp = parts[0]
+    size = len(stamp)
+    if size not in _XMLTV_STAMP_LENGTHS or not (stamp.isascii() and stamp.isdigit()):
+        return None
+
+    try:
+        return datetime(
+            int(stamp[0:4]),
+            int(stamp[4:6]),
+            int(stamp[6:8]),
+            int(stamp[8:10]) if size >= 10 else 0,
+            int(stamp[10:12]) if size >= 12 else 0,
+            int(stamp[12:14]) if size == 14 else 0,
+            tzinfo=tzinfo,
+        )
+    except ValueError:
+        return None
+
+
+def parse_programme(element: etree._Element) -> tuple[Any, ...]:
+    """Extract one ``<programme>`` as a tuple in ``XMLTVProgram`` field order.
+
+    This is the per-programme hot path: a module-level function that only touches
+    locals and the element, with no method or attribute lookups on the parser.
+    """
+    start_raw = element.get("start")
+    stop_raw = element.get("stop")
+
+    # Collect child texts in a single pass. As with find(), only the first
+    # element of each tag is used.
+    texts: dict[str, str | None] = {}
+    for child in element:
+        tag = child.tag
+        if tag not in texts:
+            text = child.text
+            texts[tag] = (text.strip() or None) if text else None
+    text_of = texts.get
+
+    return (
+        element.get("channel"),
+        start_raw,
+        parse_xmltv_datetime(start_raw),
+        stop_raw,
+        parse_xmltv_datetime(stop_raw),
+        text_of("title"),
+        text_of("sub-title"),
+        text_of("desc"),
+        text_of("date"),
+        text_of("category"),
+        text_of("keyword"),
+        text_of("language"),
+        text_of("orig-language"),
+        text_of("length"),
+        text_of("country"),
+        text_of("episode-num"),
+        "new" in texts,
+        text_of("premiere"),
+        text_of("last-chance"),
+    )
+
+
 class XMLTVParser:
     """Parse XMLTV-like files into Python dictionaries.
 
@@ -51,28 +172,60 @@ class XMLTVParser:
         return list(self.iter_parse(file_path))
 
     def iter_parse(self, file_path: str | Path) -> Iterator[XMLTVProgram]:
+        for element in self._iter_programme_elements(file_path):
+            yield XMLTVProgram(*parse_programme(element))
+
+    def iter_record_batches(
+        self, file_path: str | Path, batch_size: int = 10_000
+    ) -> Iterator[pa.RecordBatch]:
+        """Yield programmes as Arrow record batches matching ``PROGRAM_SCHEMA``.
+
+        Rows go straight from the XML into columnar batches without building an
+        ``XMLTVProgram`` per programme.
+        """
+        rows: list[tuple[Any, ...]] = []
+        for element in self._iter_programme_elements(file_path):
+            rows.append(parse_programme(element))
+            if len(rows) == batch_size:
+                yield self._record_batch(rows)
+                rows = []
+        if rows:
+            yield self._record_batch(rows)
+
+    @staticmethod
+    def _record_batch(rows: list[tuple[Any, ...]]) -> pa.RecordBatch:
+        columns = zip(*rows)
+        return pa.record_batch(
+            [pa.array(column, type=field.type) for column, field in zip(columns, PROGRAM_SCHEMA)],
+            schema=PROGRAM_SCHEMA,
+        )
+
+    def _iter_programme_elements(self, file_path: str | Path) -> Iterator[etree._Element]:
         parse_start = perf_counter()
         source = Path(file_path)
         logger.info("Starting XMLTV parse: {}", source)
 
-        context = ET.iterparse(str(file_path), events=("start", "end"))
-        root: ET.Element | None = None
+        # lxml only reports closed <programme> elements, so the loop never sees the
+        # rest of the document.
+        context = etree.iterparse(str(file_path), tag="programme", huge_tree=True)
         processed = 0
 
         with tqdm(desc="Parsing XMLTV programmes", unit="programme") as progress:
-            for event, element in context:
-                if root is None and event == "start":
-                    if element.tag != "tv":
-                        raise ValueError("Expected root element <tv> in XMLTV file.")
-                    root = element
-
-                if event == "end" and element.tag == "programme":
-                    processed += 1
-                    progress.update(1)
-                    yield self._parse_programme(element)
-                    element.clear()
-                    if root is not None:
-                        root.clear()
+            for _, element in context:
+                if processed == 0:
+                    self._check_root(element.getroottree().getroot())
+
+                processed += 1
+                progress.update(1)
+                yield element
+
+                # Free the finished programme and everything parsed before it.
+                element.clear(keep_tail=True)
+                while element.getprevious() is not None:
+                    del element.getparent()[0]
+
+        if processed == 0 and context.root is not None:
+            self._check_root(context.root)
 
         elapsed = perf_counter() - parse_start
         logger.info(
@@ -82,68 +235,12 @@ class XMLTVParser:
             elapsed,
         )
 
-    def _parse_programme(self, element: ET.Element) -> XMLTVProgram:
-        start_raw = element.get("start")
-        stop_raw = element.get("stop")
-
-        return XMLTVProgram(
-            channel=element.get("channel"),
-            start=start_raw,
-            start_dt=self.parse_xmltv_datetime(start_raw),
-            stop=stop_raw,
-            stop_dt=self.parse_xmltv_datetime(stop_raw),
-            title=self._text_or_none(element.find("title")),
-            sub_title=self._text_or_none(element.find("sub-title")),
-            description=self._text_or_none(element.find("desc")),
-            date=self._text_or_none(element.find("date")),
-            category=self._text_or_none(element.find("category")),
-            keyword=self._text_or_none(element.find("keyword")),
-            language=self._text_or_none(element.find("language")),
-            orig_language=self._text_or_none(element.find("orig-language")),
-            length=self._text_or_none(element.find("length")),
-            country=self._text_or_none(element.find("country")),
-            episode_num=self._text_or_none(element.find("episode-num")),
-            is_new=element.find("new") is not None,
-            premiere=self._text_or_none(element.find("premiere")),
-            last_chance=self._text_or_none(element.find("last-chance")),
-        )
-
     @staticmethod
-    def parse_xmltv_datetime(value: str | None) -> datetime | None:
-        if not value:
-            return None
+    def _check_root(root: etree._Element) -> None:
+        if root.tag != "tv":
+            raise ValueError("Expected root element <tv> in XMLTV file.")
 
-        match = _XMLTV_DATETIME_RE.match(value.strip())
-        if match is None:
-            return None
-
-        stamp = match.group("stamp")
-        tz = match.group("tz")
-
-        if len(stamp) == 8:
-            fmt = "%Y%m%d"
-        elif len(stamp) == 10:
-            fmt = "%Y%m%d%H"
-        elif len(stamp) == 12:
-            fmt = "%Y%m%d%H%M"
-        elif len(stamp) == 14:
-            fmt = "%Y%m%d%H%M%S"
-        else:
-            return None
-
-        try:
-            if tz:
-                return datetime.strptime(f"{stamp} {tz}", f"{fmt} %z")
-            return datetime.strptime(stamp, fmt)
-        except ValueError:
-            return None
-
-    @staticmethod
-    def _text_or_none(element: ET.Element | None) -> str | None:
-        if element is None or element.text is None:
-            return None
-        text = element.text.strip()
-        return text or None
+    parse_xmltv_datetime = staticmethod(parse_xmltv_datetime)
 
     # Additional XMLTV fields are intentionally omitted from XMLTVProgram to keep
     # the returned type flat and single-valued.